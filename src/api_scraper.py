@@ -2,14 +2,45 @@ import os
 from datetime import datetime, timedelta
 import re
 import json
-from bs4 import BeautifulSoup
+import orjson
+from lxml import etree
 import time
 import random
 from curl_cffi import requests as curl_requests # Use curl_cffi to impersonate a browser
 import logging
-from database_setup import get_db_connection
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from database_setup import get_db_connection, POOL_SIZE
 
 BASE_URL = "https://inspections.myhealthdepartment.com/"
+MAX_WORKERS = POOL_SIZE # Paths scraped concurrently, one pooled DB connection each
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+PORTAL_CACHE_FILE = os.path.join(DATA_DIR, "portal_cache.json")
+PARSE_CHUNK_SIZE = 64 * 1024 # Bytes of portal HTML fed to the parser at a time
+
+def _inspection_key(establishment_id, inspection_date, score):
+    """
+    Builds the key used to tell whether an inspection is already stored.
+    Values are normalized the way MySQL compares them: IDs as case-insensitive
+    strings, dates as YYYY-MM-DD and scores rounded to the INT column.
+    """
+    return (str(establishment_id).lower(), str(inspection_date), int(float(score) + 0.5))
+
+def _is_valid_inspection(inspection_date, score):
+    """Checks that the date is YYYY-MM-DD and the score is numeric."""
+    try:
+        datetime.strptime(inspection_date, '%Y-%m-%d')
+        float(score)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+def _has_class(elem, class_name):
+    """Checks whether an element's class attribute contains the given class."""
+    return class_name in (elem.get('class') or '').split()
 
 class ApiScraper:
     """
@@ -17,38 +48,123 @@ class ApiScraper:
     finds new inspections, and saves them to a SQLite database.
     """
     def __init__(self):
-        pass # No longer need to store db_path
+        # Each worker thread keeps one session for all the paths it scrapes
+        self._thread_state = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def _new_session(self):
+        """Creates a session that impersonates Chrome's TLS fingerprint."""
+        return curl_requests.Session(impersonate="chrome110")
+
+    def _get_session(self):
+        """
+        Returns the calling thread's session, creating it on first use, so
+        keep-alive connections and TLS sessions are reused across paths.
+        """
+        session = getattr(self._thread_state, "session", None)
+        if session is None:
+            session = self._new_session()
+            self._thread_state.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _close_sessions(self):
+        """Closes every session opened during the run."""
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._thread_state = threading.local()
+
+    def _load_portal_cache(self):
+        """Loads the cached portal validators and paths from the last discovery, if any."""
+        try:
+            with open(PORTAL_CACHE_FILE) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_portal_cache(self, response, paths):
+        """Stores the portal's ETag/Last-Modified alongside the paths parsed from it."""
+        cache = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "paths": paths
+        }
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(PORTAL_CACHE_FILE, 'w') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            logging.warning(f"Could not write portal cache. Error: {e}")
+
+    def _collect_location_hrefs(self, parser):
+        """
+        Drains the parser's pending events and returns the hrefs of the
+        "View Site" or "View Inspections" anchor tags that have closed.
+        Finished elements are discarded so the tree never grows past the open path.
+        """
+        hrefs = []
+        for _, elem in parser.read_events():
+            if elem.tag == 'a' and _has_class(elem, 'search-button'):
+                if any(_has_class(div, 'jurisdiction-section') for div in elem.iterancestors('div')):
+                    href = elem.get('href')
+                    if href:
+                        hrefs.append(href)
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return hrefs
 
     def _discover_paths(self):
         """
         Visits the main portal page to discover all available paths (states/regions).
+        Uses a conditional request so an unchanged portal is not downloaded or parsed again.
         """
         logging.info("Discovering all available health department paths...")
+        cache = self._load_portal_cache()
+        headers = {}
+        if cache.get("paths"):
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
         try:
             # Use a temporary session just for discovery
-            with curl_requests.Session(impersonate="chrome110") as session:
-                response = session.get(BASE_URL, timeout=30)
+            with self._new_session() as session:
+                response = session.get(BASE_URL, headers=headers, timeout=30)
+            if response.status_code == 304:
+                logging.info(f"Portal unchanged since last run. Using {len(cache['paths'])} cached paths.")
+                return cache["paths"]
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            # Find all the "View Site" or "View Inspections" anchor tags
-            location_links = soup.select('div.jurisdiction-section a.search-button')
-            if not location_links:
+            # Stream the page through a pull parser so only the open elements stay in memory
+            parser = etree.HTMLPullParser(events=('end',))
+            content = response.content
+            hrefs = []
+            for offset in range(0, len(content), PARSE_CHUNK_SIZE):
+                parser.feed(content[offset:offset + PARSE_CHUNK_SIZE])
+                hrefs.extend(self._collect_location_hrefs(parser))
+            parser.close()
+            hrefs.extend(self._collect_location_hrefs(parser))
+
+            if not hrefs:
                 logging.warning("Could not find any location links. Using fallback list.")
                 return ["tennessee", "alabama", "arizona", "florida"]
 
             discovered_paths = set()
-            for link in location_links:
-                href = link.get('href')
-                if href and href.startswith('/'):
+            for href in hrefs:
+                if href.startswith('/'):
                     path = href.strip('/')
                     # Filter out test/staging sites
                     if 'test' not in path and 'staging' not in path:
                         discovered_paths.add(path)
             
             logging.info(f"Discovered {len(discovered_paths)} paths to scrape.")
+            self._save_portal_cache(response, list(discovered_paths))
             return list(discovered_paths)
-        except (curl_requests.errors.RequestsError, AttributeError, json.JSONDecodeError) as e:
+        except (curl_requests.errors.RequestsError, etree.LxmlError, json.JSONDecodeError) as e:
             logging.error(f"Failed to discover paths, using fallback list. Error: {e}")
             return ["tennessee", "alabama", "arizona", "florida"]
 
@@ -80,7 +196,7 @@ class ApiScraper:
             # First attempt with the standard payload
             response = session.post(BASE_URL, json=payload, timeout=30)
             response.raise_for_status()
-            results = response.json()
+            results = orjson.loads(response.content)
 
             # If the first attempt returns nothing, try a common variation
             if not results:
@@ -88,94 +204,166 @@ class ApiScraper:
                 payload["data"]["programName"] = "Food"
                 response = session.post(BASE_URL, json=payload, timeout=30)
                 response.raise_for_status()
-                results = response.json()
+                results = orjson.loads(response.content)
 
             return results
-        except (curl_requests.errors.RequestsError, ValueError) as e:
+        except (curl_requests.errors.RequestsError, orjson.JSONDecodeError) as e:
             logging.error(f"Failed to retrieve data from API for path '{path}'. Error: {e}")
             return []
 
-    def run(self):
+    def _scrape_one_path(self, path: str):
         """
-        Main execution method. Fetches recent inspections and adds only
-        new records to the database.
-        Returns a list of newly added inspections for the bot to tweet.
+        Runs _fetch_and_save_path for a worker thread. A failing path is logged
+        and skipped, so it can't abort the run and lose the inspections other
+        paths have already committed.
         """
-        paths_to_scrape = self._discover_paths()
-        all_newly_added_inspections = []
+        try:
+            return self._fetch_and_save_path(path)
+        except Exception as e:
+            logging.error(f"Failed to scrape path '{path}'. Error: {e}")
+            return []
 
-        for path in paths_to_scrape:
-            logging.info(f"--- Fetching recent inspections for '{path}' ---")
-            
-            # Create a new session for each path to avoid being blocked
-            with curl_requests.Session(impersonate="chrome110") as session:
-                api_results = self._get_recent_inspections_for_path(session, path)
-
-            if not isinstance(api_results, list) or not api_results:
-                logging.warning(f"No data returned from API for '{path}' or API format has changed.")
-                # Add a small, random delay even on failure to be safe
-                time.sleep(random.uniform(2, 4))
-                continue
-            
-            # Add a small, random delay to avoid being rate-limited
+    def _fetch_and_save_path(self, path: str):
+        """
+        Fetches recent inspections for a single path and saves the new ones.
+        Returns the list of newly added inspections for that path.
+        """
+        newly_added_inspections = []
+
+        logging.info(f"--- Fetching recent inspections for '{path}' ---")
+
+        api_results = self._get_recent_inspections_for_path(self._get_session(), path)
+
+        if not isinstance(api_results, list) or not api_results:
+            logging.warning(f"No data returned from API for '{path}' or API format has changed.")
+            # Add a small, random delay even on failure to be safe
             time.sleep(random.uniform(2, 4))
+            return []
 
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-
-                for record in api_results:
-                    establishment_id = record.get('permitID')
-                    if not establishment_id:
-                        continue
-
-                    # Clean and format data
-                    name = record.get('establishmentName', 'N/A').strip()
-                    address = record.get('addressLine1', '').strip()
-                    
-                    permit_type_value = record.get('permitType', '')
-                    if isinstance(permit_type_value, list):
-                        category = ', '.join(permit_type_value).strip()
-                    else:
-                        category = str(permit_type_value).strip()
-
-                    inspection_date_str = record.get('inspectionDate', '').split('T')[0]
-                    score = record.get('score')
-                    
-                    # Filter out records with no score or a score of 0
-                    if score is None or score == 0:
-                        continue
-
-                    purpose = record.get('purpose', '').strip()
-
-                    # --- 1. Insert or update restaurant ---
-                    cursor.execute(
-                        "INSERT INTO restaurants (establishment_id, path, name, address, category) VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE name=VALUES(name), address=VALUES(address), category=VALUES(category)",
-                        (establishment_id, path, name, address, category)
-                    )
+        # Add a small, random delay to avoid being rate-limited
+        time.sleep(random.uniform(2, 4))
 
-                    # --- 2. Check if inspection is new ---
-                    cursor.execute(
-                        "SELECT id FROM inspections WHERE establishment_id = %s AND establishment_path = %s AND inspection_date = %s AND score = %s",
-                        (establishment_id, path, inspection_date_str, score)
-                    )
-                    if cursor.fetchone():
-                        continue # Skip if it already exists
+        inspection_rows = []
+
+        for record in api_results:
+            establishment_id = record.get('permitID')
+            if not establishment_id:
+                continue
+
+            # Clean and format data
+            name = record.get('establishmentName', 'N/A').strip()
+            address = record.get('addressLine1', '').strip()
+
+            permit_type_value = record.get('permitType', '')
+            if isinstance(permit_type_value, list):
+                category = ', '.join(permit_type_value).strip()
+            else:
+                category = str(permit_type_value).strip()
+
+            inspection_date_str = record.get('inspectionDate', '').split('T')[0]
+            score = record.get('score')
+
+            # Filter out records with no score or a score of 0
+            if score is None or score == 0:
+                continue
+
+            # INSERT IGNORE would store a malformed date or score as a zero value
+            # instead of rejecting it, so drop such records here
+            if not _is_valid_inspection(inspection_date_str, score):
+                logging.warning(f"  Skipping malformed record for {name} ({path}): date={inspection_date_str!r}, score={score!r}")
+                continue
+
+            purpose = record.get('purpose', '').strip()
+
+            inspection_rows.append((establishment_id, inspection_date_str, score, purpose, name, address, category))
+
+        if not inspection_rows:
+            return []
 
-                    logging.info(f"  New inspection found: {name} ({path}) on {inspection_date_str} - Score: {score}")
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
 
-                    # --- 3. Insert new inspection ---
+            # --- 1. Load existing inspections for this path in a single query ---
+            earliest_date = min(row[1] for row in inspection_rows)
+            cursor.execute(
+                "SELECT establishment_id, inspection_date, score FROM inspections WHERE establishment_path = %s AND inspection_date >= %s",
+                (path, earliest_date)
+            )
+            existing = {_inspection_key(eid, date, score) for eid, date, score in cursor.fetchall()}
+
+            # Most of the 30-day window is already stored, so only rows with a new
+            # inspection need their restaurant upserted or their inspection inserted
+            restaurant_rows = {}
+            new_inspections = []
+            for establishment_id, inspection_date_str, score, purpose, name, address, category in inspection_rows:
+                key = _inspection_key(establishment_id, inspection_date_str, score)
+                if key in existing:
+                    continue # Skip if it already exists
+                existing.add(key)
+
+                restaurant_rows[key[0]] = (establishment_id, path, name, address, category)
+                new_inspections.append((establishment_id, inspection_date_str, score, purpose, name))
+
+            if not new_inspections:
+                return []
+
+            # --- 2. Insert or update restaurants in one batch ---
+            cursor.executemany(
+                "INSERT INTO restaurants (establishment_id, path, name, address, category) VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE name=VALUES(name), address=VALUES(address), category=VALUES(category)",
+                list(restaurant_rows.values())
+            )
+
+            # --- 3. Insert new inspections in one batch ---
+            cursor.executemany(
+                "INSERT IGNORE INTO inspections (establishment_id, establishment_path, inspection_date, score, purpose) VALUES (%s, %s, %s, %s, %s)",
+                [(establishment_id, path, inspection_date_str, score, purpose)
+                 for establishment_id, inspection_date_str, score, purpose, _ in new_inspections]
+            )
+
+            # Another run may have stored some rows since the lookup above; the
+            # uq_inspection key makes the server skip them. If so, find which rows this
+            # insert actually stored (ids from its first generated id onwards) so
+            # skipped rows aren't tweeted twice.
+            if cursor.rowcount < len(new_inspections):
+                stored = set()
+                if cursor.rowcount > 0:
                     cursor.execute(
-                        "INSERT INTO inspections (establishment_id, establishment_path, inspection_date, score, purpose) VALUES (%s, %s, %s, %s, %s)",
-                        (establishment_id, path, inspection_date_str, score, purpose)
+                        "SELECT establishment_id, inspection_date, score FROM inspections WHERE establishment_path = %s AND id >= %s",
+                        (path, cursor.lastrowid)
                     )
+                    stored = {_inspection_key(eid, date, score) for eid, date, score in cursor.fetchall()}
+                new_inspections = [
+                    row for row in new_inspections
+                    if _inspection_key(row[0], row[1], row[2]) in stored
+                ]
+
+            for establishment_id, inspection_date_str, score, purpose, name in new_inspections:
+                logging.info(f"  New inspection found: {name} ({path}) on {inspection_date_str} - Score: {score}")
+                newly_added_inspections.append({
+                    "name": name,
+                    "score": score,
+                    "date": inspection_date_str
+                })
 
-                    all_newly_added_inspections.append({
-                        "name": name,
-                        "score": score,
-                        "date": inspection_date_str
-                    })
+            conn.commit()
 
-                conn.commit()
+        return newly_added_inspections
+
+    def run(self):
+        """
+        Main execution method. Fetches recent inspections and adds only
+        new records to the database.
+        Paths are independent, so they are scraped concurrently.
+        Returns a list of newly added inspections for the bot to tweet.
+        """
+        paths_to_scrape = self._discover_paths()
+
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                results = executor.map(self._scrape_one_path, paths_to_scrape)
+                all_newly_added_inspections = list(chain.from_iterable(results))
+        finally:
+            self._close_sessions()
 
         logging.info(f"Scraping complete. Found and added {len(all_newly_added_inspections)} new inspections across all paths.")
         return all_newly_added_inspections
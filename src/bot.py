@@ -4,6 +4,50 @@ from dotenv import load_dotenv
 from api_scraper import ApiScraper
 from logger_setup import setup_logging
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TWEET_WORKERS = 5 # Number of tweets posted concurrently
+TWEET_RETRIES = 3 # Attempts per tweet when rate-limited or on server errors
+TWEET_MAX_WAIT = 120 # Longest wait in seconds for a rate-limit reset before giving up
+
+def _post_tweet(client, inspection):
+    """
+    Posts a single inspection tweet, backing off and retrying when Twitter
+    rate-limits the request or has a transient server error.
+    Returns True if the tweet was posted.
+    """
+    tweet_text = f"✅ Health Score: {inspection['name']} scored a {inspection['score']} on {inspection['date']}."
+    for attempt in range(1, TWEET_RETRIES + 1):
+        try:
+            client.create_tweet(text=tweet_text)
+            logging.info(f"  Posted tweet for {inspection['name']}")
+            return True
+        except tweepy.errors.TooManyRequests as e:
+            if attempt == TWEET_RETRIES:
+                logging.error(f"  Error posting tweet for {inspection['name']}: {e}")
+                return False
+            # Wait for the rate-limit window to reset if Twitter tells us when that is,
+            # but give up rather than stall the run on a long window (e.g. the daily cap)
+            delay = 2 ** attempt
+            reset = e.response.headers.get("x-rate-limit-reset") if e.response is not None else None
+            if reset:
+                delay = max(delay, int(reset) - time.time())
+            if delay > TWEET_MAX_WAIT:
+                logging.error(f"  Rate limit for {inspection['name']} resets in {delay:.0f}s; giving up: {e}")
+                return False
+            logging.warning(f"  Retrying tweet for {inspection['name']} in {delay:.0f}s: {e}")
+            time.sleep(delay)
+        except tweepy.errors.TwitterServerError as e:
+            if attempt == TWEET_RETRIES:
+                logging.error(f"  Error posting tweet for {inspection['name']}: {e}")
+                return False
+            delay = 2 ** attempt
+            logging.warning(f"  Retrying tweet for {inspection['name']} in {delay}s: {e}")
+            time.sleep(delay)
+        except tweepy.errors.TweepyException as e:
+            logging.error(f"  Error posting tweet for {inspection['name']}: {e}")
+            return False
 
 def run_bot():
     """
@@ -40,13 +84,12 @@ def run_bot():
     )
 
     # --- Post tweets ---
-    for inspection in new_inspections:
-        tweet_text = f"✅ Health Score: {inspection['name']} scored a {inspection['score']} on {inspection['date']}."
-        try:
-            client.create_tweet(text=tweet_text)
-            logging.info(f"  Posted tweet for {inspection['name']}")
-        except tweepy.errors.TweepyException as e:
-            logging.error(f"  Error posting tweet for {inspection['name']}: {e}")
+    with ThreadPoolExecutor(max_workers=TWEET_WORKERS) as executor:
+        posted = list(executor.map(lambda inspection: _post_tweet(client, inspection), new_inspections))
+
+    failed = posted.count(False)
+    if failed:
+        logging.warning(f"Failed to post {failed} of {len(new_inspections)} tweets.")
 
 if __name__ == "__main__":
     run_bot()
\ No newline at end of file
@@ -1,17 +1,44 @@
 import os
+import threading
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
 from dotenv import load_dotenv
 
+# Number of pooled connections. get_connection() raises PoolError instead of
+# waiting when every connection is in use, so concurrent callers (the
+# scraper's worker threads) must never outnumber this.
+POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
 def get_db_connection():
-    """Establishes a connection to the MySQL database."""
-    load_dotenv()
-    return mysql.connector.connect(
-        host=os.environ.get("DB_HOST"),
-        user=os.environ.get("DB_USER"),
-        password=os.environ.get("DB_PASSWORD"),
-        database=os.environ.get("DB_NAME")
-    )
+    """
+    Hands out a connection from a shared MySQL connection pool.
+    The pool is created on first use; closing the connection returns it to the pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            load_dotenv()
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="inspections",
+                pool_size=POOL_SIZE,
+                host=os.environ.get("DB_HOST"),
+                user=os.environ.get("DB_USER"),
+                password=os.environ.get("DB_PASSWORD"),
+                database=os.environ.get("DB_NAME")
+            )
+    return _pool.get_connection()
+
+def _add_index(cursor, table, definition):
+    """Adds an index to an existing table, ignoring it if it is already there."""
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+    except mysql.connector.Error as err:
+        if err.errno == errorcode.ER_DUP_KEYNAME:
+            return
+        print(f"Could not add index to '{table}': {err}")
 
 def setup_database():
     """
@@ -47,9 +74,14 @@ def setup_database():
         inspection_date DATE NOT NULL,
         score INT,
         purpose TEXT,
-        FOREIGN KEY (establishment_id, establishment_path) REFERENCES restaurants (establishment_id, path)
+        FOREIGN KEY (establishment_id, establishment_path) REFERENCES restaurants (establishment_id, path),
+        UNIQUE KEY `uq_inspection` (establishment_id, establishment_path, inspection_date, score),
+        INDEX `idx_inspection_date_score` (inspection_date, score)
     ) ENGINE=InnoDB
     """)
+    # Tables created before these keys existed need them added separately
+    _add_index(cursor, "inspections", "UNIQUE KEY `uq_inspection` (establishment_id, establishment_path, inspection_date, score)")
+    _add_index(cursor, "inspections", "INDEX `idx_inspection_date_score` (inspection_date, score)")
 
     # Create violations table
     cursor.execute("""
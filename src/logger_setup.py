@@ -1,14 +1,32 @@
+import gzip
 import logging
 import os
+import shutil
+from logging.handlers import MemoryHandler, RotatingFileHandler
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 LOG_FILE = os.path.join(DATA_DIR, "scraper.log")
 
+LOG_MAX_BYTES = 10 * 1024 * 1024 # Rotate the log file once it reaches 10 MB
+LOG_BACKUP_COUNT = 3 # Number of compressed old log files to keep
+LOG_BUFFER_CAPACITY = 1024 # Records buffered in memory before being written
+
+def _gzip_namer(name):
+    """Names rotated log files with a .gz suffix."""
+    return name + ".gz"
+
+def _gzip_rotator(source, dest):
+    """Compresses the rotated log file instead of just renaming it."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
 def setup_logging():
     """
     Configures logging to write to both the console and a file.
-    The log file is overwritten on each run.
+    File records are buffered in memory and written in batches (immediately
+    for errors); the log file is rotated and gzipped once it gets too large.
     """
     os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -16,15 +34,32 @@ def setup_logging():
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-    # Clear existing handlers to avoid duplicate logs if run multiple times
+    # Clear existing handlers to avoid duplicate logs if run multiple times,
+    # closing them first so any buffered records are flushed and files released
     if logger.hasHandlers():
+        for handler in logger.handlers:
+            # MemoryHandler.close() flushes its target but leaves it open, and
+            # also resets handler.target, so grab it before closing
+            target = getattr(handler, "target", None)
+            handler.close()
+            if target is not None:
+                target.close()
         logger.handlers.clear()
 
-    # Create file handler (mode='w' overwrites the file)
+    # Create rotating file handler
     # This handler will have a detailed format for the log file.
-    file_handler = logging.FileHandler(LOG_FILE, mode='w')
+    rotating_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    rotating_handler.namer = _gzip_namer
+    rotating_handler.rotator = _gzip_rotator
     file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(file_formatter)
+    rotating_handler.setFormatter(file_formatter)
+
+    # Buffer file records so they are written in batches rather than one syscall each.
+    # The buffer is flushed when full, on errors, and when logging shuts down.
+    file_handler = MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY, flushLevel=logging.ERROR,
+        target=rotating_handler, flushOnClose=True
+    )
 
     # Create console handler
     # This handler will have a simple format to mimic print() for the console.
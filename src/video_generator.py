@@ -1,6 +1,7 @@
 import os
 from datetime import datetime, timedelta
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+import av
+from PIL import Image, ImageDraw, ImageFont
 from database_setup import get_db_connection
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -9,6 +10,29 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 # --- Configuration for the Video Report ---
 SCORE_THRESHOLD = 85  # The score below which inspections are included
 VIDEO_RESULT_LIMIT = 5  # The number of results to show in the video
+VIDEO_DURATION = 15  # Seconds of the template used for the report
+VIDEO_FPS = 24
+FONT_PATH = os.path.join(DATA_DIR, "font.ttf")
+
+def _load_font(name, size):
+    """Loads a TrueType font, falling back to data/font.ttf and then Pillow's default font."""
+    for candidate in (name, FONT_PATH):
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+def _render_text(text, font, color, frame_size):
+    """
+    Renders text once onto a transparent image and returns it with the
+    position that centers it on a frame of the given size.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    overlay = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).text((-left, -top), text, font=font, fill=color)
+    position = ((frame_size[0] - overlay.width) // 2, (frame_size[1] - overlay.height) // 2)
+    return overlay, position
 
 def create_weekly_report():
     """
@@ -38,25 +62,92 @@ def create_weekly_report():
     # --- Video Generation ---
     # NOTE: You must have 'template.mp4' in your data/ directory.
     template_path = os.path.join(DATA_DIR, "template.mp4")
-    background_clip = VideoFileClip(template_path).subclip(0, 15) # Use first 15 seconds
-    
-    clips = [background_clip]
-    start_time = 1 # Start text after 1 second
+    output_path = os.path.join(DATA_DIR, "weekly_report.mp4")
 
-    title_clip = TextClip("This Week's Lowest Scores", fontsize=50, color='white', font='Arial-Bold').set_pos('center').set_duration(2).set_start(start_time)
-    clips.append(title_clip)
-    start_time += 3
+    with av.open(template_path) as template, av.open(output_path, "w") as output:
+        source = template.streams.video[0]
+        frame_size = (source.codec_context.width, source.codec_context.height)
 
-    for row in results:
-        text = f"{row['name']}: {row['score']}"
-        txt_clip = TextClip(text, fontsize=40, color='yellow', font='Arial')
-        txt_clip = txt_clip.set_pos('center').set_duration(2).set_start(start_time)
-        clips.append(txt_clip)
-        start_time += 2.5 # Each score appears for 2s with a 0.5s gap
+        stream = output.add_stream("h264", rate=VIDEO_FPS)
+        stream.width, stream.height = frame_size
+        stream.pix_fmt = "yuv420p"
 
-    output_path = os.path.join(DATA_DIR, "weekly_report.mp4")
-    final_video = CompositeVideoClip(clips)
-    final_video.write_videofile(output_path, fps=24)
+        # The template's soundtrack is copied through without re-encoding
+        audio = template.streams.audio[0] if template.streams.audio else None
+        audio_stream = output.add_stream_from_template(audio) if audio else None
+
+        # Pre-render every text overlay once as (start, end, image, position)
+        title_font = _load_font("arialbd.ttf", 50)
+        row_font = _load_font("arial.ttf", 40)
+        overlays = []
+        start_time = 1 # Start text after 1 second
+
+        overlays.append((start_time, start_time + 2, *_render_text("This Week's Lowest Scores", title_font, "white", frame_size)))
+        start_time += 3
+
+        for row in results:
+            text = f"{row['name']}: {row['score']}"
+            overlays.append((start_time, start_time + 2, *_render_text(text, row_font, "yellow", frame_size)))
+            start_time += 2.5 # Each score appears for 2s with a 0.5s gap
+
+        def write_frame(background, index):
+            t = index / VIDEO_FPS
+            image = background
+            for start, end, overlay, position in overlays:
+                if start <= t < end:
+                    if image is background:
+                        image = background.copy()
+                    image.paste(overlay, position, overlay)
+            output.mux(stream.encode(av.VideoFrame.from_image(image)))
+
+        def copy_audio(packet):
+            """Copies an audio packet if it falls within the report; returns False once past it."""
+            if packet.pts is None:
+                return True
+            if packet.pts * packet.time_base >= VIDEO_DURATION:
+                return False
+            packet.stream = audio_stream
+            output.mux(packet)
+            return True
+
+        # Resample the template to a constant frame rate, holding each
+        # decoded frame until the next one starts
+        total_frames = VIDEO_DURATION * VIDEO_FPS
+        index = 0
+        background = None
+        audio_done = audio is None
+        for packet in template.demux([s for s in (source, audio) if s is not None]):
+            if packet.stream is audio:
+                if not audio_done:
+                    audio_done = not copy_audio(packet)
+                continue
+
+            for frame in packet.decode():
+                if frame.time is None:
+                    continue
+                if background is not None:
+                    while index < total_frames and index / VIDEO_FPS < frame.time:
+                        write_frame(background, index)
+                        index += 1
+                if index >= total_frames:
+                    break
+                background = frame.to_image()
+
+            if index >= total_frames:
+                break
+
+        # Once the video is complete, demux only the audio stream for the rest of
+        # the soundtrack; this ends at the report length or when the audio runs out
+        if not audio_done:
+            for packet in template.demux(audio):
+                if not copy_audio(packet):
+                    break
+
+        while background is not None and index < total_frames:
+            write_frame(background, index)
+            index += 1
+
+        output.mux(stream.encode())
 
     print(f"Video report '{output_path}' has been generated.")
 